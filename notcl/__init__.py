@@ -1,4 +1,5 @@
 # SPDX-FileCopyrightText: 2024 Tobias Kaiser <mail@tb-kaiser.de>
 # SPDX-License-Identifier: Apache-2.0
 
-from .tcltool import TclTool, TclError
\ No newline at end of file
+from .tcltool import TclTool, TclError
+from .pool import TclToolPool
\ No newline at end of file
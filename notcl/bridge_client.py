@@ -1,6 +1,8 @@
 # SPDX-FileCopyrightText: 2024 Tobias Kaiser <mail@tb-kaiser.de>
 # SPDX-License-Identifier: Apache-2.0
 
+import os
+
 from .message import RawMessage, Message, WrongMessageClass
 from . import msg_classes as msg
 
@@ -12,15 +14,21 @@ class BridgeClient:
         self.fn_py2tcl = fn_py2tcl
 
     def send(self, msg: Message):
-        with open(self.fn_tcl2py, "wb") as f_out:
-            msg.to_raw_message().send_to_pipe(f_out)
+        fd = os.open(self.fn_tcl2py, os.O_WRONLY)
+        try:
+            msg.to_raw_message().send_to_pipe(fd)
+        finally:
+            os.close(fd)
 
 
     def recv(self, permitted_msg_classes):
         """permitted_msg_classes can be either one message class or a list of message classes."""
 
-        with open(self.fn_py2tcl, "rb") as f_in:
-            raw_message = RawMessage.from_pipe(f_in)
+        fd = os.open(self.fn_py2tcl, os.O_RDONLY)
+        try:
+            raw_message = RawMessage.from_pipe(fd)
+        finally:
+            os.close(fd)
         return raw_message.to_message(permitted_msg_classes)
 
     def run(self):
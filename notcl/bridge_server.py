@@ -6,9 +6,60 @@ from contextlib import contextmanager
 from pathlib import Path
 from enum import Enum
 import os
+import selectors
+import fcntl
+from functools import lru_cache
 
-from .message import RawMessage, Message, WrongMessageClass
+from .message import RawMessage, Message, WrongMessageClass, frame_header
 
+class ChildProcessExited(Exception):
+    """
+    This exception is raised on abnormal / early termination of the Tcl child
+    process. BridgeServer raises it when the watched child exits while it
+    waits for a pipe (see BridgeServer.watch_child and
+    BridgeServer.watch_child_fd, which TclTool._sigchld_handler notifies
+    through a pipe). It interrupts the current TclTool context. It is caught in
+    TclTool.contextmanager. Typically, TclTool.contextmanager will then raise
+    a subprocess.CalledProcessError based on the child's return code.
+    """
+    pass
+
+def get_iov_max() -> int:
+    try:
+        iov_max = os.sysconf("SC_IOV_MAX")
+    except (ValueError, OSError):
+        iov_max = -1
+    # 16 is the minimum that POSIX guarantees.
+    return iov_max if iov_max > 0 else 16
+
+iov_max = get_iov_max()
+"""Maximum number of buffers per os.writev call."""
+
+@lru_cache(maxsize=1)
+def pidfd_supported() -> bool:
+    """
+    Returns True if os.pidfd_open is available in Python and supported by the
+    kernel (Linux 5.3+), which is required by BridgeServer.watch_child.
+    """
+    if not hasattr(os, "pidfd_open"):
+        return False
+    try:
+        os.close(os.pidfd_open(os.getpid()))
+    except OSError:
+        return False
+    return True
+
+@lru_cache(maxsize=1)
+def pipe_max_size() -> int:
+    """
+    Returns the maximum pipe capacity that unprivileged processes can set on
+    Linux, or 0 if it is unknown.
+    """
+    try:
+        with open("/proc/sys/fs/pipe-max-size") as f:
+            return int(f.read())
+    except (OSError, ValueError):
+        return 0
 
 class BridgeServer:
     class State(Enum):
@@ -34,38 +85,194 @@ class BridgeServer:
             self.fn_py2tcl = str(Path(tmp_dir) / "py2tcl")
             os.mkfifo(self.fn_tcl2py)
             os.mkfifo(self.fn_py2tcl)
+            # Both pipes are opened once in read-write mode and stay open for
+            # the lifetime of the context. As Python holds both ends, opens
+            # by the Tcl child never block, and a message written to py2tcl
+            # stays buffered until the Tcl child opens the pipe to read it.
+            self.fd_tcl2py = os.open(self.fn_tcl2py, os.O_RDWR)
+            self.fd_py2tcl = os.open(self.fn_py2tcl, os.O_RDWR)
+            # Reads and writes do not block. recv_raw waits on recv_selector
+            # until the Tcl child has sent data. When the py2tcl pipe is full,
+            # send_raw waits on send_selector until the Tcl child has read
+            # some data.
+            os.set_blocking(self.fd_tcl2py, False)
+            os.set_blocking(self.fd_py2tcl, False)
+            self.set_pipe_size(self.fd_tcl2py)
+            self.set_pipe_size(self.fd_py2tcl)
+            self.recv_selector = selectors.DefaultSelector()
+            self.recv_selector.register(self.fd_tcl2py, selectors.EVENT_READ)
+            self.send_selector = selectors.DefaultSelector()
+            self.send_selector.register(self.fd_py2tcl, selectors.EVENT_WRITE)
+            self.child_fd = None
+            # Received data that has not been parsed yet is held in
+            # rbuf[rstart:rend].
+            self.rbuf = bytearray(self.read_size)
+            self.rstart = 0
+            self.rend = 0
+            # The Tcl child starts by sending TclHello.
+            self.replies_pending = 1
             self.state = self.state.WaitForRecv
             try:
                 yield self
             finally:
+                self.recv_selector.close()
+                self.send_selector.close()
+                if self.child_fd != None:
+                    os.close(self.child_fd)
+                    self.child_fd = None
+                os.close(self.fd_tcl2py)
+                os.close(self.fd_py2tcl)
                 self.log("BridgeServer: connection closed.")
                 self.state = self.State.NotListening
 
+    pipe_size = 1 << 20
+    """
+    Requested capacity of the pipes in bytes. It is limited to the system's
+    pipe-max-size.
+    """
+
+    def set_pipe_size(self, fd: int):
+        """
+        Enlarges the kernel buffer of a pipe (Linux only), so that large
+        messages need fewer reads and writes. The default pipe capacity is used
+        if the size cannot be changed.
+        """
+        if not hasattr(fcntl, "F_SETPIPE_SZ"):
+            return
+        try:
+            size = self.pipe_size
+            if pipe_max_size() > 0:
+                size = min(size, pipe_max_size())
+            fcntl.fcntl(fd, fcntl.F_SETPIPE_SZ, size)
+        except OSError as e:
+            self.log(f"BridgeServer: Could not set pipe size: {e}")
+
+    def watch_child(self, pid: int):
+        """
+        Makes recv_raw and send_raw raise ChildProcessExited when the process
+        with the given pid exits while they are waiting for the Tcl child.
+        Requires os.pidfd_open (Linux 5.3+), see pidfd_supported.
+        """
+        self.watch_child_fd(os.pidfd_open(pid))
+
+    def watch_child_fd(self, fd: int):
+        """
+        Like watch_child, but uses a file descriptor that becomes readable
+        when the child exits, e.g. a pipe written by a SIGCHLD handler.
+        fd is closed at the end of the BridgeServer context.
+        """
+        assert self.child_fd == None
+        self.child_fd = fd
+        self.recv_selector.register(self.child_fd, selectors.EVENT_READ)
+        self.send_selector.register(self.child_fd, selectors.EVENT_READ)
+
+    def wait(self, selector, fd: int):
+        """
+        Waits until fd is ready. Raises ChildProcessExited if the watched child
+        process has exited and fd is not ready.
+        """
+        ready = [key.fd for key, events in selector.select()]
+        if (fd not in ready) and (self.child_fd in ready):
+            self.log("BridgeServer: Child process exited.")
+            raise ChildProcessExited()
+
+    read_size = 1 << 16
+    """Minimum size of the receive buffer in bytes."""
+
+    def fill(self, length: int):
+        """
+        Reads from tcl2py until at least length unparsed bytes are buffered.
+        Each read takes as much as fits into the receive buffer, so that
+        multiple queued messages (e.g. results of a pipeline) are received
+        with one read.
+        """
+        if self.rstart + length > len(self.rbuf):
+            # Move unparsed data to the front, enlarging the buffer if needed.
+            pending = self.rbuf[self.rstart:self.rend]
+            if length > len(self.rbuf):
+                self.rbuf = bytearray(length)
+            self.rbuf[:len(pending)] = pending
+            self.rstart = 0
+            self.rend = len(pending)
+        with memoryview(self.rbuf) as view:
+            while self.rend - self.rstart < length:
+                try:
+                    n = os.readv(self.fd_tcl2py, [view[self.rend:]])
+                except BlockingIOError:
+                    self.wait(self.recv_selector, self.fd_tcl2py)
+                    continue
+                if n == 0:
+                    raise EOFError("pipe closed while waiting for message")
+                self.rend += n
+
+    def write_all(self, buffers: list):
+        """
+        Writes all buffers to py2tcl without concatenating them first. Each
+        writev call takes at most iov_max buffers.
+        """
+        views = [memoryview(buf) for buf in buffers if len(buf) > 0]
+        i = 0
+        while i < len(views):
+            try:
+                n = os.writev(self.fd_py2tcl, views[i:i+iov_max])
+            except BlockingIOError:
+                self.wait(self.send_selector, self.fd_py2tcl)
+                continue
+            # Skip what has been written, which can end within a buffer.
+            while n > 0 and n >= len(views[i]):
+                n -= len(views[i])
+                i += 1
+            if n > 0:
+                views[i] = views[i][n:]
+
     def recv_raw(self) -> RawMessage:
         assert self.state == self.State.WaitForRecv
-        self.log(f"BridgeServer: Opening tcl2py pipe {self.fn_py2tcl} to receive message...")
-        with open(self.fn_tcl2py, "rb") as f_in:
-            m_recv = RawMessage.from_pipe(f_in)
-        self.log(f"BridgeServer: tcl2py pipe {self.fn_py2tcl} closed.")
-        self.state = self.State.WaitForSend
+        self.log(f"BridgeServer: Waiting for message on tcl2py pipe {self.fn_tcl2py}...")
+        self.fill(frame_header.size)
+        length, = frame_header.unpack_from(self.rbuf, self.rstart)
+        self.fill(frame_header.size + length)
+        start = self.rstart + frame_header.size
+        with memoryview(self.rbuf) as view:
+            m_recv = RawMessage.from_bytes(view[start:start+length])
+        self.rstart = start + length
+        if self.rstart == self.rend:
+            self.rstart = 0
+            self.rend = 0
+            if len(self.rbuf) > self.read_size:
+                # Do not hold on to the memory of a large message.
+                self.rbuf = bytearray(self.read_size)
+        self.log(f"BridgeServer: Received message of {length} bytes.")
+        self.replies_pending -= 1
+        if self.replies_pending == 0:
+            self.state = self.State.WaitForSend
         return m_recv
 
-    def send_raw(self, send_data: RawMessage):
+    def send_raw(self, *send_data: RawMessage, replies: int=1):
+        """
+        Sends one or more messages with a single write. replies is the number
+        of messages that the Tcl child sends back in response, which have to
+        be received before the next send_raw.
+        """
         assert self.state == self.State.WaitForSend
-        self.log(f"BridgeServer: Opening py2tcl pipe {self.fn_py2tcl} to send message...")
-        with open(self.fn_py2tcl, "wb") as f_out:
-            send_data.send_to_pipe(f_out)
-        self.log(f"BridgeServer: py2tcl pipe {self.fn_py2tcl} closed.")
-            
-        self.state = self.State.WaitForRecv
+        self.log(f"BridgeServer: Sending {len(send_data)} message(s) on py2tcl pipe {self.fn_py2tcl}...")
+        buffers = []
+        for raw_msg in send_data:
+            body = raw_msg.to_bytes()
+            buffers.append(frame_header.pack(len(body)))
+            buffers.append(body)
+        self.write_all(buffers)
+        self.log(f"BridgeServer: Sent {len(send_data)} message(s).")
+
+        self.replies_pending = replies
+        if replies > 0:
+            self.state = self.State.WaitForRecv
 
     def recv(self, permitted_msg_classes) -> Message:
         """permitted_msg_classes can be either one message class or a list of message classes."""
         return self.recv_raw().to_message(permitted_msg_classes)
 
-    def send(self, message: Message):
-        raw_msg = message.to_raw_message()
-        self.send_raw(raw_msg)
+    def send(self, *messages: Message, replies: int=1):
+        self.send_raw(*[message.to_raw_message() for message in messages], replies=replies)
 
     def __enter__(self):
         assert self.cm == None
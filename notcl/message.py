@@ -1,42 +1,92 @@
 # SPDX-FileCopyrightText: 2024 Tobias Kaiser <mail@tb-kaiser.de>
 # SPDX-License-Identifier: Apache-2.0
 
-import re
-from base64 import b64encode, b64decode
-import socket
+import os
+import string
+import struct
+
+frame_header = struct.Struct(">I")
+"""Every message is preceded by its length in bytes (32-bit big-endian)."""
+
+key_header = struct.Struct(">H")
+value_header = struct.Struct(">I")
+
+strip_valid_key_chars = str.maketrans("", "", string.ascii_letters + "_+")
+"""Translation table that deletes all valid key characters. A key is valid
+if nothing remains after translation."""
+
+def read_exact(fd: int, length: int) -> bytearray:
+    data = bytearray()
+    while len(data) < length:
+        chunk = os.read(fd, length - len(data))
+        if not chunk:
+            raise EOFError("pipe closed while waiting for message")
+        data += chunk
+    return data
+
+def text(value) -> str:
+    """Returns a message value as str. Received values are UTF-8 encoded bytes."""
+    if isinstance(value, str):
+        return value
+    return str(value, "utf8")
 
 class RawMessage(dict):
     """Keys can only contain a-z, A-Z and underscores.
-    RawMessages can be decoded to Messages."""
-    @classmethod
-    def from_pipe(cls, f_in):
-        """reads until EOF"""
-        msg_list = f_in.read().split(b"\n")
-        if len(msg_list)%2 != 0:
-            raise ValueError("RawMessage requires an even number of items (key value pairs)")
-    
-        msg = cls()
-        while len(msg_list)>0:
-            key = msg_list.pop(0).decode("ascii")
-            value = msg_list.pop(0)
+    RawMessages can be decoded to Messages.
+
+    In the message body, every key is preceded by its length (16-bit
+    big-endian) and every UTF-8 encoded value is preceded by its length
+    (32-bit big-endian).
 
-            msg[key] = b64decode(value).decode("utf8")
+    Received values are kept as UTF-8 encoded bytes and only decoded when they
+    are accessed through a Message."""
+    @classmethod
+    def from_pipe(cls, fd: int):
+        """reads one length-prefixed message from file descriptor fd"""
+        length, = frame_header.unpack(read_exact(fd, frame_header.size))
+        return cls.from_bytes(read_exact(fd, length))
 
+    @classmethod
+    def from_bytes(cls, data: bytes):
+        """decodes a message body (without length prefix)"""
+        view = memoryview(data)
+        msg = cls()
+        pos = 0
+        while pos < len(view):
+            key_len, = key_header.unpack_from(view, pos)
+            pos += key_header.size
+            key = str(view[pos:pos+key_len], "ascii")
+            pos += key_len
+            value_len, = value_header.unpack_from(view, pos)
+            pos += value_header.size
+            msg[key] = bytes(view[pos:pos+value_len])
+            pos += value_len
+        if pos != len(view):
+            raise ValueError("RawMessage is truncated")
         return msg
 
 
-    def send_to_pipe(self, f_out):
-        msg_list = []
+    def send_to_pipe(self, fd: int):
+        """writes the message with length prefix to file descriptor fd"""
+        body = self.to_bytes()
+        view = memoryview(frame_header.pack(len(body)) + body)
+        while len(view) > 0:
+            view = view[os.write(fd, view):]
+
+    def to_bytes(self) -> bytearray:
+        """encodes the message body (without length prefix)
+        Values can be str or already UTF-8 encoded bytes-like objects."""
+        data = bytearray()
         for key, value in self.items():
-            if not re.fullmatch("[a-zA-Z_+]*", key):
+            if key.translate(strip_valid_key_chars):
                 raise ValueError(f"Messages keys can only contain a-z, A-Z and underscores, got '{key}'")
-            msg_list.append(key.encode("ascii"))
-            msg_list.append(b64encode(value.encode("utf8")))
-        f_out.write(b"\n".join(msg_list))
-        f_out.flush()
-
-    def decode(self, msg_classes):
-        pass
+            if isinstance(value, str):
+                value = value.encode("utf8")
+            data += key_header.pack(len(key))
+            data += key.encode("ascii")
+            data += value_header.pack(len(value))
+            data += value
+        return data
 
     def to_message(self, permitted_msg_classes):
         """Converts RawMessage to Message.
@@ -44,11 +94,10 @@ class RawMessage(dict):
         if isinstance(permitted_msg_classes, type):
             permitted_msg_classes = (permitted_msg_classes, )
 
+        msg_class = text(self.get("class", ""))
         for cls in permitted_msg_classes:
-            try:
+            if cls._cls_name == msg_class:
                 return cls(self)
-            except WrongMessageClass:
-                pass
         raise WrongMessageClass()
 
 class WrongMessageClass(Exception):
@@ -61,24 +110,35 @@ class Message:
 
     __slots__=("_data",)
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Value of the "class" key, looked up once per message.
+        cls._cls_name = cls.__name__
+        # Fields are accessed as attributes through properties.
+        for key in cls.keys_required + cls.keys_optional:
+            setattr(cls, key, property(lambda self, key=key: text(self._data[key])))
+
     def __init__(self, source: dict=None, **kwargs):
         """Can either be initialized from dict that has been received or by providing values for all fields."""
         if source:
             assert len(kwargs)==0
             assert not ("class" in kwargs) 
-            if source["class"] != self.__class__.__name__:
+            if text(source["class"]) != self._cls_name:
                 raise WrongMessageClass()
             self._data = dict(source)
         else:
             self._data = dict(kwargs)
-            self._data["class"] = self.__class__.__name__
+            self._data["class"] = self._cls_name
+
+    def get_bytes(self, key: str) -> bytes:
+        """Returns the value of a field as UTF-8 encoded bytes without decoding it."""
+        value = self._data[key]
+        if isinstance(value, str):
+            return value.encode("utf8")
+        return value
 
     def to_raw_message(self):
         return RawMessage(self._data)
 
     def __repr__(self):
-        cls_name = self.__class__.__name__
-        return f"<{cls_name} {self._data}>"
-
-    def __getattr__(self, name):
-        return self._data[name]
\ No newline at end of file
+        return f"<{self._cls_name} {self._data}>"
\ No newline at end of file
@@ -12,10 +12,22 @@ class PyProcedureCall(Message):
     __slots__ = ()
     keys_required = ["command"]
 
+class PyProcedureCallBatch(Message):
+    """Followed by count PyProcedureCall messages in the same write."""
+    __slots__ = ()
+    keys_required = ["count"]
+
 class TclProcedureResult(Message):
     __slots__ = ()
     keys_required = ["err_code", "result", "cmd_idx"]
 
+class PyReset(Message):
+    """Answered by TclResetDone."""
+    __slots__ = ()
+
+class TclResetDone(Message):
+    __slots__ = ()
+
 class PyExit(Message):
     __slots__ = ()
     keys_required = ["quit"]
@@ -0,0 +1,137 @@
+# SPDX-FileCopyrightText: 2024 Tobias Kaiser <mail@tb-kaiser.de>
+# SPDX-License-Identifier: Apache-2.0
+
+import queue
+import signal
+from contextlib import contextmanager
+
+from .tcltool import TclTool, TclToolInterface, TclError
+
+class TclToolPool:
+    """
+    Keeps a number of Tcl tool child processes running and hands them out for
+    short sessions, which avoids the startup time of the Tcl tool per session.
+    Between sessions, the Tcl tool is reset using TclTool.reset. Only TclTool
+    subclasses with reusable set to True can be pooled.
+
+    As TclTool installs signal handlers when a Tcl tool is started, including
+    replacements of failed Tcl tools, the pool must only be used from the
+    main thread.
+
+    Example::
+
+        class ReusableTclsh(Tclsh):
+            reusable = True
+
+        with TclToolPool(ReusableTclsh, size=2) as pool:
+            for i in range(10):
+                with pool.acquire() as t:
+                    v = t.expr(i, "*", i)
+    """
+
+    signals = (signal.SIGINT, signal.SIGCHLD)
+    """Signals whose handlers are installed by TclTool."""
+
+    def __init__(self, tool_cls: type, size: int=4, *args, **kwargs):
+        """
+        Args:
+            tool_cls: TclTool subclass with reusable set to True.
+            size: Number of Tcl tool child processes.
+            args, kwargs: Passed to tool_cls on instantiation.
+        """
+        assert issubclass(tool_cls, TclTool)
+        if not tool_cls.reusable:
+            raise ValueError(f"{tool_cls.__name__} is not reusable.")
+        self.tool_cls = tool_cls
+        self.size = size
+        self.args = args
+        self.kwargs = kwargs
+        self.tools = []
+        self.idle = queue.SimpleQueue()
+        # Restored in close, as the tools do not terminate in reverse order.
+        self.prev_handlers = {sig: signal.getsignal(sig) for sig in self.signals}
+        try:
+            for i in range(size):
+                self.idle.put(self.start_tool())
+        except:
+            self.close()
+            raise
+
+    def start_tool(self) -> TclTool:
+        tool = self.tool_cls(*self.args, **self.kwargs)
+        assert not tool.interact
+        tool.__enter__()
+        self.tools.append(tool)
+        return tool
+
+    def stop_tool(self, tool: TclTool, exc_type=None, exc_value=None, traceback=None):
+        self.tools.remove(tool)
+        # TclTool restores the signal handlers that were installed when it was
+        # started, which would disable the handlers of tools started later.
+        handlers = {sig: signal.getsignal(sig) for sig in self.signals}
+        try:
+            tool.__exit__(exc_type, exc_value, traceback)
+        finally:
+            for sig, handler in handlers.items():
+                signal.signal(sig, handler)
+
+    def release_tool(self, tool: TclTool):
+        """Resets a Tcl tool after a session and marks it as idle."""
+        try:
+            tool.reset()
+        except BaseException as e:
+            self.replace_tool(tool, e)
+            raise
+        self.idle.put(tool)
+
+    def replace_tool(self, tool: TclTool, exc: BaseException):
+        """
+        Terminates a Tcl tool after exc was raised in its session and starts a
+        new one. Exceptions raised while doing so are chained to exc.
+        """
+        stop_exc = None
+        try:
+            self.stop_tool(tool, type(exc), exc, exc.__traceback__)
+        except BaseException as e:
+            if e is not exc:
+                stop_exc = e
+        try:
+            self.idle.put(self.start_tool())
+        except BaseException as start_exc:
+            raise start_exc from exc
+        if stop_exc:
+            raise stop_exc from exc
+
+    @contextmanager
+    def acquire(self):
+        """
+        Waits for an idle Tcl tool and yields its TclToolInterface. When a
+        session ends with an exception other than TclError or the reset fails,
+        the Tcl tool is terminated and replaced by a new one.
+        """
+        tool = self.idle.get()
+        try:
+            yield TclToolInterface(tool)
+        except TclError:
+            self.release_tool(tool)
+            raise
+        except BaseException as e:
+            self.replace_tool(tool, e)
+            raise
+        else:
+            self.release_tool(tool)
+
+    def close(self):
+        """Terminates all Tcl tools. Must only be called when all sessions have ended."""
+        try:
+            while len(self.tools) > 0:
+                self.stop_tool(self.tools[-1])
+        finally:
+            for sig, handler in self.prev_handlers.items():
+                signal.signal(sig, handler)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -1,8 +1,6 @@
 # SPDX-FileCopyrightText: 2024 Tobias Kaiser <mail@tb-kaiser.de>
 # SPDX-License-Identifier: Apache-2.0
 
-# base64::encode and base64::decode are used instead of "binary encode base64"
-# and "binary decode base64" for Tcl 8.5 (?) support.
 namespace eval NoTcl {
     global env
 
@@ -17,23 +15,13 @@ namespace eval NoTcl {
         proc log {message} {}
     }
 
-    variable base64_impl
     variable fn_py2tcl
     variable fn_tcl2py
 
-    if {[catch {package require base64}]} {
-        # Error thrown - package not found.
-        log "Using built-in base64 implementation."
-        set base64_impl builtin
-    } else {
-        log "Using base64 package."
-        set base64_impl package
-    }
-
     proc safe_obj_to_str {obj} {
         # This call to "format" copies the string value of data_in to data_in-str.
         # It prevents loss of opaque reference data due to conversion of
-        # internal representation triggered by "binary encode" command.
+        # internal representation triggered by "encoding convertto" command.
         # To makes sure that this is not optimized away, we temporarily append
         # and then remove an 'X' character from the string.
         # (See also: "shimmering")
@@ -43,57 +31,71 @@ namespace eval NoTcl {
         return $str
     }
 
-    proc b64encode {data_in} {
-        variable base64_impl
-
-        set data_in [safe_obj_to_str $data_in]
-        
-        # -maxlen 0 prevents line wrapping by base64::encode, which would mess everything up.
-        switch $base64_impl {
-            package {
-                return [base64::encode -maxlen 0 $data_in]
-            }
-            builtin {
-                return [binary encode base64 -maxlen 0 $data_in]
-            }
-            default {
-                return -code error "no base64 implementation selected"
-            }
+    proc encodemsg {msg} {
+        # Every key is preceded by its length (16-bit big-endian), every
+        # UTF-8 encoded value is preceded by its length (32-bit big-endian).
+        set data {}
+        dict for {key value} $msg {
+            set value [encoding convertto utf-8 [safe_obj_to_str $value]]
+            append data [binary format S [string length $key]] $key
+            append data [binary format I [string length $value]] $value
         }
+        return [binary format I [string length $data]]$data
     }
 
-    proc b64decode {data_in} {
-        variable base64_impl
-        switch $base64_impl {
-            package {
-                return [base64::decode $data_in]
-            }
-            builtin {
-                return [binary decode base64 $data_in]
-            }
-            default {
-                return -code error "no base64 implementation selected"
-            }
+    # Sends a list of messages, opening the tcl2py pipe only once.
+    proc sendmsgs {msgs} {
+        variable fn_tcl2py
+
+        set data {}
+        foreach msg $msgs {
+            append data [encodemsg $msg]
         }
-    }
 
-    proc sendmsg {msg} {
-        variable fn_tcl2py
-        
-        log "sendmsg: opening tcl2py pipe $fn_tcl2py to send message..."
+        log "sendmsg: opening tcl2py pipe $fn_tcl2py to send [llength $msgs] message(s)..."
         set pipe [open $fn_tcl2py w]
-        set first 1
-        dict for {key value} $msg {
-            if { ! $first } {
-                puts $pipe {}
-            }
-            puts $pipe $key
-            puts -nonewline $pipe [NoTcl::b64encode $value]
-            set first 0
-        }
+        # With the largest channel buffer, all messages are usually written
+        # with a single system call.
+        fconfigure $pipe -translation binary -buffersize 1048576
+        puts -nonewline $pipe $data
         flush $pipe
         close $pipe
-        log "sendmsg: message sent, tcl2py pipe $fn_tcl2py closed."
+        log "sendmsg: message(s) sent, tcl2py pipe $fn_tcl2py closed."
+    }
+
+    proc sendmsg {msg} {
+        sendmsgs [list $msg]
+    }
+
+    # Messages are prefixed with their length (32-bit big-endian). Python
+    # keeps its ends of the pipes open, so the message end is not signaled
+    # by EOF.
+    proc read_exact {pipe length} {
+        set data [read $pipe $length]
+        if { [string length $data] != $length } {
+            return -code error "pipe closed while waiting for message"
+        }
+        return $data
+    }
+
+    proc readmsg {pipe} {
+        binary scan [read_exact $pipe 4] Iu length
+        set data [read_exact $pipe $length]
+
+        set msg {}
+        set pos 0
+        while { $pos < [string length $data] } {
+            binary scan $data @${pos}Su key_length
+            incr pos 2
+            set key [string range $data $pos [expr {$pos + $key_length - 1}]]
+            incr pos $key_length
+            binary scan $data @${pos}Iu value_length
+            incr pos 4
+            set value [string range $data $pos [expr {$pos + $value_length - 1}]]
+            incr pos $value_length
+            dict append msg $key [encoding convertfrom utf-8 $value]
+        }
+        return $msg
     }
 
     proc recvmsg {} {
@@ -101,11 +103,18 @@ namespace eval NoTcl {
         
         log "recvmsg: opening py2tcl pipe $fn_py2tcl to receive message..."
         set pipe [open $fn_py2tcl r]
-        set msg {}
-        while { ! [eof $pipe]} {
-            set key [gets $pipe]
-            set value [NoTcl::b64decode [gets $pipe]]
-            dict append msg $key $value
+        # With the largest channel buffer, a PyProcedureCallBatch and its
+        # PyProcedureCall messages are usually read with a single system call.
+        fconfigure $pipe -translation binary -buffersize 1048576
+        set msg [readmsg $pipe]
+        # A PyProcedureCallBatch message is directly followed by its
+        # PyProcedureCall messages, which are read before the pipe is closed.
+        if { [dict get $msg class] == "PyProcedureCallBatch" } {
+            set calls {}
+            for {set i 0} {$i < [dict get $msg count]} {incr i} {
+                lappend calls [readmsg $pipe]
+            }
+            dict set msg calls $calls
         }
         close $pipe
         log "recvmsg: message received, py2tcl pipe $fn_py2tcl closed."
@@ -122,13 +131,13 @@ namespace eval NoTcl {
         sendmsg $s_msg
     }
 
-    proc send_proc_result {err_code cmd_idx result} {
+    proc proc_result_msg {err_code cmd_idx result} {
         set s_msg {}
         dict append s_msg "class" "TclProcedureResult"
         dict append s_msg "err_code" $err_code
         dict append s_msg "cmd_idx" $cmd_idx
         dict append s_msg "result" $result
-        sendmsg $s_msg
+        return $s_msg
     }
 
     # The results are stored as $res($cmd_idx) array values in order to ensure that
@@ -144,10 +153,62 @@ namespace eval NoTcl {
         return [expr [lsearch [info commands $cmd] $cmd] >= 0]
     }
 
+    # Runs a command sent from Python and returns its TclProcedureResult
+    # message. All commands are run in the scope of comm_loop, which persists
+    # between commands.
+    proc run_proc_call {cmd} {
+        variable cmd_idx
+        variable cmd_results
+        variable comm_loop_level
+        variable repr_supported
+
+        log "Executing command: $cmd"
+
+        set err_code [uplevel #$comm_loop_level [list catch $cmd ::NoTcl::cmd_results($cmd_idx)]]
+
+        # This should output something like: "Command finished, return value is a pure string with a refcount[...]"
+        # Unfortunately, this is not always supported.
+        #log "Command finished, return [::tcl::unsupported::representation $cmd_results($cmd_idx)]" 
+        if { $repr_supported } {
+            log "Command finished, returned [::tcl::unsupported::representation $cmd_results($cmd_idx)]."
+        } else {
+            log [format "Command finished, returned \"%s\"." $cmd_results($cmd_idx)]
+        }
+
+        set r_msg [proc_result_msg $err_code $cmd_idx $cmd_results($cmd_idx)]
+        set cmd_idx [expr $cmd_idx + 1]
+        return $r_msg
+    }
+
+    # Runs the commands of a PyProcedureCallBatch and returns one
+    # TclProcedureResult message per command. After the first failed command,
+    # the remaining commands are skipped, but their cmd_idx values are still
+    # used up, as Python has already assigned them to its references.
+    proc run_proc_call_batch {calls} {
+        variable cmd_idx
+
+        set r_msgs {}
+        set failed 0
+        foreach call $calls {
+            if { $failed } {
+                lappend r_msgs [proc_result_msg 1 $cmd_idx "not executed due to a previous error"]
+                set cmd_idx [expr $cmd_idx + 1]
+            } else {
+                set r_msg [run_proc_call [dict get $call command]]
+                set failed [dict get $r_msg err_code]
+                lappend r_msgs $r_msg
+            }
+        }
+        return $r_msgs
+    }
+
     proc comm_loop {} {
         variable cmd_idx
         variable cmd_results
+        variable comm_loop_level
+        variable repr_supported
 
+        set comm_loop_level [info level]
         set repr_supported [command_present "::tcl::unsupported::representation"]
 
         set pyexit_received 0
@@ -156,23 +217,15 @@ namespace eval NoTcl {
             set class [dict get $r_msg class]
             switch $class {
                 PyProcedureCall {
-                    set cmd [dict get $r_msg command]
-
-                    log "Executing command: $cmd"
-
-                    set err_code [catch $cmd cmd_results($cmd_idx)]
-
-                    # This should output something like: "Command finished, return value is a pure string with a refcount[...]"
-                    # Unfortunately, this is not always supported.
-                    #log "Command finished, return [::tcl::unsupported::representation $cmd_results($cmd_idx)]" 
-                    if { $repr_supported } {
-                        log "Command finished, returned [::tcl::unsupported::representation $cmd_results($cmd_idx)]."
-                    } else {
-                        log [format "Command finished, returned \"%s\"." $cmd_results($cmd_idx)]
-                    }
-
-                    send_proc_result $err_code $cmd_idx $cmd_results($cmd_idx)
-                    set cmd_idx [expr $cmd_idx + 1]
+                    sendmsg [run_proc_call [dict get $r_msg command]]
+                }
+                PyProcedureCallBatch {
+                    sendmsgs [run_proc_call_batch [dict get $r_msg calls]]
+                }
+                PyReset {
+                    # Leaving comm_loop discards all variables set by the
+                    # commands of the current session (see main).
+                    return reset
                 }
                 PyExit {
                     set pyexit_received 1
@@ -187,9 +240,27 @@ namespace eval NoTcl {
         return $pyexit_quit
     }
 
+    # Releases all results, restarts their numbering and acknowledges the
+    # PyReset message.
+    proc reset {} {
+        variable cmd_idx
+        variable cmd_results
+
+        array unset cmd_results
+        set cmd_idx 0
+
+        set s_msg {}
+        dict append s_msg "class" "TclResetDone"
+        sendmsg $s_msg
+    }
+
     proc main {} {
         NoTcl::send_hello
-        if { [ NoTcl::comm_loop ] } {
+        # Every session runs in a new comm_loop scope.
+        while { [set quit [ NoTcl::comm_loop ]] == "reset" } {
+            NoTcl::reset
+        }
+        if { $quit } {
             exit
         }
     }
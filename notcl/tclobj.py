@@ -1,8 +1,9 @@
 # SPDX-FileCopyrightText: 2024 Tobias Kaiser <mail@tb-kaiser.de>
 # SPDX-License-Identifier: Apache-2.0
 
-import re
-from functools import reduce
+from itertools import chain
+from functools import lru_cache
+from typing import Union
 
 """
 The Return value of a Tcl command or procedure is basically a string. Without
@@ -23,15 +24,54 @@ class TclRemoteObjRef:
     Tcl return values are encapsulated in instances of TclRemoteObjRef.
     Using str(), the string representation of the TclRemoteObjRef can be
     accessed. 
+
+    Within TclTool.pipeline, the value is None until the pipelined commands
+    have been sent to Tcl. Accessing the value sends the pending commands.
+
+    The value is received as UTF-8 encoded bytes and decoded on first use, as
+    many results (e. g. handles) are only passed back to Tcl by reference.
+    bytes() returns the undecoded value.
     """
 
-    def __init__(self, tool, cmd_idx:int, value:str, cmd:str):
+    __slots__ = ("tool", "cmd_idx", "_value", "cmd", "_ref_str", "_error")
+
+    def __init__(self, tool, cmd_idx:int, value:Union[str, bytes, None], cmd:str):
         self.tool = tool
         self.cmd_idx = cmd_idx
-        self.value = value
+        self._value = value
         self.cmd=cmd
+        self._ref_str = f"$cmd_results({cmd_idx})"
+        self._error = None
+
+    @property
+    def value(self) -> str:
+        value = self._value
+        if type(value) is not str:
+            if value is None and self._error is None:
+                # The command is still pending in TclTool.pipeline.
+                self.tool.flush_pipeline()
+                value = self._value
+            if value is None:
+                if self._error:
+                    raise RuntimeError(self._error)
+                raise RuntimeError(f"Result of pipelined Tcl command '{self.cmd}' is not available.")
+            value = self._value = str(value, "utf8")
+        return value
+
+    def resolve(self, value:Union[str, bytes]):
+        """Sets the value of a pipelined TclRemoteObjRef. Used by TclTool.pipeline."""
+        self._value = value
+
+    def fail(self, error:str):
+        """
+        Marks a pipelined TclRemoteObjRef as failed. Accessing its value raises
+        a RuntimeError with the message error. Used by TclTool.pipeline.
+        """
+        self._error = error
 
     def __repr__(self):
+        if self._value is None:
+            return f'<TclRemoteObjRef pending: {self._ref_str}>'
         return f'Tcl{repr(self.value)}'
 
     def ref_str(self):
@@ -40,11 +80,19 @@ class TclRemoteObjRef:
             A Tcl string referencing the corresponding Tcl object in the
             $cmd_results Tcl array, e. g. '$cmd_results(123)'.
         """
-        return f"$cmd_results({self.cmd_idx})"
+        if self._error:
+            # The $cmd_results entry is missing or belongs to another command.
+            raise RuntimeError(self._error)
+        return self._ref_str
 
     def __str__(self):
         return self.value
 
+    def __bytes__(self):
+        if isinstance(self._value, bytes):
+            return self._value
+        return self.value.encode("utf8")
+
     def __int__(self):
         return int(self.value)
 
@@ -92,9 +140,26 @@ class TclRemoteObjRef:
             raise ValueError('called_object_pos must be "first", "second" or "last".')
         return self.tool.proc_call(name, args, kwargs)
 
+brace_escapes = str.maketrans({"{": r"\{", "}": r"\}"})
+
 # TODO: Is there a problem with escape_braces?
 def escape_braces(data) -> str:
-    return re.sub(r"([{}])", r"\\\1", data)
+    return data.translate(brace_escapes)
+
+@lru_cache(maxsize=4096, typed=True)
+def encode_scalar(obj) -> str:
+    """
+    Cached encoding of str, int and bool values, which are often passed
+    repeatedly. typed=True keeps apart values that compare equal, such as True
+    and 1, which are encoded differently. Floats are not cached, as 0.0 and
+    -0.0 compare equal but are encoded differently.
+    """
+    return "{" + escape_braces(str(obj)) + "}"
+
+scalar_types = frozenset((str, int, bool))
+
+encode_scalar_max_len = 256
+"""Longer strings are not cached to keep the cache small."""
 
 def encode(obj, nested:bool=False) -> str:
     """
@@ -105,12 +170,25 @@ def encode(obj, nested:bool=False) -> str:
         obj encoded as Tcl string
     """
 
-    if isinstance(obj, (list, tuple)):
-        return "{" + " ".join(map(lambda elem: encode(elem, nested=True), obj)) + "}"
+    if type(obj) is str:
+        # Fast path for the most common argument type.
+        if len(obj) <= encode_scalar_max_len:
+            return encode_scalar(obj)
+        return "{" + escape_braces(obj) + "}"
+    elif type(obj) in scalar_types:
+        return encode_scalar(obj)
+    elif isinstance(obj, (list, tuple)):
+        return "{" + " ".join(encode(elem, True) for elem in obj) + "}"
     elif isinstance(obj, dict):
-        item_list = reduce(lambda a, b: a+b, obj.items())
-        return "{" + " ".join(map(lambda elem: encode(elem, nested=True), item_list)) + "}"
+        item_list = chain.from_iterable(obj.items())
+        return "{" + " ".join(encode(elem, True) for elem in item_list) + "}"
     elif isinstance(obj, TclRemoteObjRef) and not nested:
         return obj.ref_str()
     else:
         return "{" + escape_braces(str(obj)) + "}"
+
+# Common tokens such as operators and small integers are encoded in advance,
+# so that they are cache hits already on first use.
+for token in chain("+-*/%<>=", ("==", "!=", "<=", ">=", "&&", "||"), range(-128, 256)):
+    encode_scalar(token)
+del token
@@ -9,13 +9,16 @@ import signal
 from typing import Literal, Union, Optional
 from abc import ABC, abstractmethod
 from pathlib import Path
+import contextlib
+import atexit
 from contextlib import contextmanager
+from functools import lru_cache
 
 from . import tclobj, tcl
 from . import msg_classes as msg
 
 from .tclobj import TclRemoteObjRef
-from .bridge_server import BridgeServer
+from .bridge_server import BridgeServer, ChildProcessExited, pidfd_supported
 
 class ANSITerm:
     FgBrightYellow = "\x1b[93m"
@@ -23,6 +26,31 @@ class ANSITerm:
     BgGreen = "\x1b[42m"
     Reset = "\x1b[0m"
 
+def log_prefix(log_type:str, fancy:bool) -> str:
+    symbol = {"command": "Cmd:", "retval": "Result:", "error": "Error:", "info": "Info:"}[log_type]
+    if not fancy:
+        return f"[notcl] {symbol}"
+    style_symbol = {"error": ANSITerm.BgRed, "info": ANSITerm.BgGreen}.get(log_type, "")
+    return f"{ANSITerm.FgBrightYellow}[notcl]{ANSITerm.Reset} {style_symbol}{symbol}{ANSITerm.Reset}"
+
+log_prefixes = {(log_type, fancy): log_prefix(log_type, fancy)
+    for log_type in ("command", "retval", "error", "info") for fancy in (False, True)}
+"""Complete log line prefix for (log_type, log_fancy)"""
+
+@lru_cache(maxsize=1)
+def notcl_tcl_path() -> str:
+    """
+    Returns:
+        Filename of the notcl.tcl file. If the package is not installed as
+        plain files (e.g. zipped), notcl.tcl is extracted only once and removed
+        at interpreter exit.
+    """
+    stack = contextlib.ExitStack()
+    path = stack.enter_context(importlib.resources.as_file(
+        importlib.resources.files(tcl).joinpath("notcl.tcl")))
+    atexit.register(stack.close)
+    return str(path)
+
 class TclError(Exception):
     """
     Errors in Tcl are forwarded to Python and raised in the form of a TclError
@@ -36,17 +64,6 @@ class TclError(Exception):
     def __str__(self):
         return self.text
 
-class ChildProcessExited(Exception):
-    """
-    This exception is raised on abnormal / early termination of the Tcl child
-    process through TclTool._sigchld_handler. It interrupts the
-    current TclTool context. It is caught in TclTool.contextmanager.
-    Typically, TclTool.contextmanager will then raise a subprocess.CalledProcessError
-    based on the child's return code.
-    """
-    pass
-
-
 class TclTool(ABC):
     called_object_pos = "second"
     """
@@ -55,9 +72,30 @@ class TclTool(ABC):
     Must be 'first', 'second' oder 'last' (see TclRemoteObjRef.proc_call). 
     """ 
 
+    precompiled = ()
+    """
+    Names of Tcl commands that are often called without arguments, such as
+    'current_design'. TclToolInterface provides them as methods that pass the
+    name to TclTool.eval directly when called without arguments, bypassing
+    argument encoding. Can be overwritten in subclasses.
+    """
+
+    pipeline_max_len = 256
+    """
+    Maximum number of commands collected by TclTool.pipeline before they are
+    sent. Bounds the batch size in long pipelines, e.g. with pipelined=True.
+    """
+
+    reusable = False
+    """
+    Set to True in subclasses whose Tcl tool can be reused for multiple
+    sessions by TclToolPool (see TclTool.reset).
+    """
+
     def __init__(self, cwd:Optional[Union[Path, str]]=None, interact:bool=False,
             log_commands:bool=True, log_retvals:bool=False, log_fancy:bool=True,
-            debug_tcl:bool=False, debug_py:bool=False, abort_on_error:bool=True):
+            debug_tcl:bool=False, debug_py:bool=False, abort_on_error:bool=True,
+            pipelined:bool=False):
         """
         Args:
             cwd: Directory in which to Tcl-based tool is run.
@@ -74,6 +112,10 @@ class TclTool(ABC):
             debug_py: Enable detailed debug output for Python side.
             abort_on_error: Terminate child process when a Tcl error occured, even
                 if interact is set to True.
+            pipelined: Run the whole with block as pipeline (see
+                TclTool.pipeline): commands are only sent when a result is
+                accessed or the with block ends, and Tcl errors are raised
+                at that point.
         """
 
         self.interact = interact
@@ -83,7 +125,11 @@ class TclTool(ABC):
         self.debug_tcl=debug_tcl
         self.debug_py=debug_py
         self.abort_on_error = abort_on_error
+        self.pipelined = pipelined
         self._script_name = None
+        self._pipeline = None
+        self._next_cmd_idx = 0
+        self._sigchld_w = None
         self.cm = None
         
         if not cwd:
@@ -111,8 +157,8 @@ class TclTool(ABC):
         """
         # This used to be a call to pkg_resources. After migration to
         # importlib.resources, this now is only a wratter to get a value
-        # passed from contextmanager(self), which obtains it as context
-        # from importlib.resources.as_file.
+        # passed from contextmanager(self), which obtains it from
+        # notcl_tcl_path.
         if self._script_name==None:
             return "<placeholder for notcl.tcl>"
         else:
@@ -123,11 +169,14 @@ class TclTool(ABC):
         Returns:
             Modified environment for child process.
         """
-        env = os.environ.copy()
-        env["NOTCL_PIPE_TCL2PY"]=self.bs.fn_tcl2py
-        env["NOTCL_PIPE_PY2TCL"]=self.bs.fn_py2tcl
-        env["NOTCL_DEBUG_TCL"]=("1" if self.debug_tcl else "0")
-        return env
+        # The full parent environment is passed on, as Tcl-based tools often
+        # depend on it (license servers, tool installation paths).
+        return {
+            **os.environ,
+            "NOTCL_PIPE_TCL2PY": self.bs.fn_tcl2py,
+            "NOTCL_PIPE_PY2TCL": self.bs.fn_py2tcl,
+            "NOTCL_DEBUG_TCL": ("1" if self.debug_tcl else "0"),
+        }
 
     def debug_log(self, message:str):
         """
@@ -139,10 +188,32 @@ class TclTool(ABC):
     def _sigchld_handler(self, sig, frame):
         """
         Called when child process exists, vis SIGHCLD Unix signal.
-        This will typically interrupt the open() call in BridgeServer.recv_raw.
+        Writes to the pipe that BridgeServer watches (see
+        BridgeServer.watch_child_fd), which makes BridgeServer raise
+        ChildProcessExited. Only used where BridgeServer.watch_child is not
+        supported.
+
+        SIGCHLD is also received when other child processes exit, e.g. the
+        one of a nested TclTool context. Only the exit of self.proc is
+        signalled. The previous handler is called as well, so that an outer
+        TclTool context still notices the exit of its child process.
         """
+        prev = self._prev_sigchld
+        if callable(prev):
+            prev(sig, frame)
+        self._notify_child_exited()
+
+    def _notify_child_exited(self):
+        # _sigchld_w is None once the context has finished. The handler can
+        # still be reached through the previous handler of a TclTool started
+        # later, e.g. in TclToolPool.
+        if self._sigchld_w is None or self.proc is None or self.proc.poll() is None:
+            return
         self.debug_log("Received SIGCHLD (child process terminated)")
-        raise ChildProcessExited()
+        try:
+            os.write(self._sigchld_w, b"\0")
+        except BlockingIOError:
+            pass # The pipe is readable already.
             
 
     @contextmanager
@@ -154,24 +225,47 @@ class TclTool(ABC):
         not normally used externally.
         """
 
-        with BridgeServer(custom_log_func=self.debug_log) as self.bs,\
-            importlib.resources.as_file(importlib.resources.files(tcl).joinpath("notcl.tcl")) as script_name:
+        with BridgeServer(custom_log_func=self.debug_log) as self.bs:
 
             try:
-                self._script_name = script_name
+                self._script_name = notcl_tcl_path()
                 cmdline = self.cmdline()
             finally:
-                # Clear self._script_name to make sure it never contains an invalid
-                # invalid path (after leaving the script_name context here):
+                # Clear self._script_name, as it is only meant to be used
+                # within cmdline():
                 self._script_name = None
             
             env = self.env()
             cwd = self.cwd
             
-            signal.signal(signal.SIGCHLD, self._sigchld_handler)
-            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            # With pidfd support, BridgeServer detects the exit of the child
+            # itself. Otherwise, the SIGCHLD handler notifies BridgeServer
+            # through a pipe.
+            watch_child = pidfd_supported()
+
+            if not watch_child:
+                sigchld_r, self._sigchld_w = os.pipe()
+                os.set_blocking(self._sigchld_w, False)
+                self.bs.watch_child_fd(sigchld_r)
+                self.proc = None
+                self._prev_sigchld = signal.getsignal(signal.SIGCHLD)
+                signal.signal(signal.SIGCHLD, self._sigchld_handler)
+            # The previous handlers are restored at the end, which keeps
+            # nested TclTool contexts working.
+            prev_sigint = signal.signal(signal.SIGINT, signal.SIG_IGN)
             
             self.proc = subprocess.Popen(cmdline, cwd=cwd, env=env)
+            if not watch_child:
+                # The child might have exited before self.proc was set.
+                self._notify_child_exited()
+            else:
+                try:
+                    self.bs.watch_child(self.proc.pid)
+                except OSError:
+                    # E.g. out of file descriptors: do not leave the child behind.
+                    self.proc.kill()
+                    self.proc.wait()
+                    raise
             
             clean_exit = True
 
@@ -180,11 +274,25 @@ class TclTool(ABC):
             else:
                 quit = '1'
 
+            self._next_cmd_idx = 0
+
             try:
                 self.hello=self.bs.recv(msg.TclHello)
                 self.debug_log(f"Received TclHello: {self.hello}")
                 try:
-                    yield TclToolInterface(self)
+                    if self.pipelined:
+                        with self.pipeline() as interface:
+                            try:
+                                yield interface
+                            except ChildProcessExited:
+                                raise
+                            except:
+                                # Commands issued before the exception are
+                                # run, as they would be without pipelining.
+                                self.flush_pipeline()
+                                raise
+                    else:
+                        yield TclToolInterface(self)
                 except ChildProcessExited:
                     clean_exit = False
                 except:
@@ -204,15 +312,17 @@ class TclTool(ABC):
                         
                         if quit == '0':
                             self.log("info", "Python control finished. Please exit Tcl tool to continue Python script.")
-                        self.bs.send(msg.PyExit(quit=quit))
+                        self.bs.send(msg.PyExit(quit=quit), replies=0)
             except:    
                 raise
             finally:
-                # TODO: There is at least one unhandled race condition here:
-                # What if we receive SIGCHLD before the signal handler is disabled?
-
-                signal.signal(signal.SIGCHLD, signal.SIG_IGN)
-                signal.signal(signal.SIGINT, signal.SIG_DFL)
+                # Without watch_child, a SIGCHLD received before the signal
+                # handler is disabled only writes to the pipe.
+                if not watch_child:
+                    signal.signal(signal.SIGCHLD, self._prev_sigchld)
+                    sigchld_w, self._sigchld_w = self._sigchld_w, None
+                    os.close(sigchld_w)
+                signal.signal(signal.SIGINT, prev_sigint)
                 
                 self.debug_log("TclTool context finished, waiting for child process to terminate.")
                 rc = self.proc.wait()
@@ -235,6 +345,21 @@ class TclTool(ABC):
         self.cm = None
         return cm.__exit__(exc_type, exc_value, traceback)
 
+    def reset(self):
+        """
+        Prepares a running Tcl tool for reuse by TclToolPool. Discards all
+        variables set by the commands of the previous session and releases all
+        results held by Tcl, which invalidates all TclRemoteObjRefs of the
+        previous session. Global state (global variables, procedures, open
+        designs) is kept. Overwrite in subclasses to additionally clear
+        tool-specific state, calling TclTool.reset at the end.
+        """
+        assert self.reusable
+        self.debug_log("Sending PyReset")
+        self.bs.send(msg.PyReset())
+        self.bs.recv(msg.TclResetDone)
+        self._next_cmd_idx = 0
+
     def proc_call(self, cmd:str, args:list, kwargs:dict):
         """
         Calls a procedure or command within Tcl. This method is invoked
@@ -249,20 +374,35 @@ class TclTool(ABC):
         # Reason why we have args and kwargs here instead of *args and **kwards: This
         # way we can support -self or -cmd als names Tcl command arguments.
 
+        if not args and not kwargs:
+            return self.eval(cmd)
+
         full_cmd = [cmd]
         for k, v in kwargs.items():
-            if type(v)==bool:
-                if v:
-                    full_cmd.append("-"+k)
-            else:
+            # True and False are the only bool instances, so identity checks
+            # replace the type check.
+            if v is True:
+                full_cmd.append("-"+k)
+            elif v is not False:
                 full_cmd.append("-"+k)
                 full_cmd.append(tclobj.encode(v))
         
-        for arg in args:
-            full_cmd.append(tclobj.encode(arg))
+        full_cmd.extend(map(tclobj.encode, args))
 
         return self.eval(" ".join(full_cmd))
 
+    def proc_call_many(self, calls:list) -> list[TclRemoteObjRef]:
+        """
+        Calls multiple Tcl procedures or commands with a single round trip
+        (see pipeline).
+
+        Args:
+            calls: list of (cmd, args, kwargs) tuples, see proc_call.
+        """
+        with self.pipeline():
+            refs = [self.proc_call(cmd, args, kwargs) for cmd, args, kwargs in calls]
+        return refs
+
     def log(self, log_type:Literal["command", "info", "retval", "error"], data:str):
         """
         log prints log messages for every Tcl command invokation and every
@@ -274,49 +414,140 @@ class TclTool(ABC):
             self.debug_log(f"Running command: {data}")
             if not self.log_commands:
                 return
-            log_symbol = "Cmd:"
         elif log_type == "retval":
             self.debug_log(f"Return value: {data}")
             if not self.log_retvals:
                 return
-            log_symbol = "Result:"
         elif log_type == "error":
             self.debug_log(f"Received error as return value: {data}")
-            log_symbol = "Error:"
-        elif log_type == "info":
-            log_symbol = "Info:"
-
-        style_notcl = ""
-        style_reset = ""
-        style_symbol = ""
-
-        if self.log_fancy:
-            style_notcl = ANSITerm.FgBrightYellow
-            style_reset = ANSITerm.Reset
-            if log_type=="error":
-                style_symbol = ANSITerm.BgRed
-            elif log_type=="info":
-                style_symbol = ANSITerm.BgGreen
-        
-        print(f"{style_notcl}[notcl]{style_reset} {style_symbol}{log_symbol}{style_reset} {data}")
+
+        print(log_prefixes[log_type, bool(self.log_fancy)], data)
 
     def eval(self, cmd: str) -> TclRemoteObjRef:
         """
         Low-level method that passes a string to Tcl for evaluation.
         """
-        self.log("command", cmd)
+        # log is skipped early when it would not print anything.
+        if self.log_commands or self.debug_py:
+            self.log("command", cmd)
+        if self._pipeline != None:
+            # Tcl numbers its results consecutively, so the cmd_idx of a
+            # pipelined command is known before it is sent.
+            ref = TclRemoteObjRef(self, self._next_cmd_idx, None, cmd)
+            self._next_cmd_idx += 1
+            self._pipeline.append(ref)
+            if len(self._pipeline) >= self.pipeline_max_len:
+                self.flush_pipeline()
+            return ref
         self.bs.send(msg.PyProcedureCall(command=cmd))
         r_msg = self.bs.recv(msg.TclProcedureResult)
-        cmd_idx = int(r_msg.cmd_idx)
-        err_code = int(r_msg.err_code)
-        
-        if err_code:
-            self.log("error", f"{r_msg.result}")
-            raise TclError(r_msg.result)
-        else:
-            self.log("retval", r_msg.result)
-            return TclRemoteObjRef(self, cmd_idx, r_msg.result, cmd)
+        # As in pipeline, the cmd_idx assigned by Tcl is known in advance.
+        cmd_idx = self._next_cmd_idx
+        self._next_cmd_idx += 1
+        assert int(r_msg.cmd_idx) == cmd_idx
         
+        if r_msg.err_code == "0":
+            if self.log_retvals or self.debug_py:
+                self.log("retval", r_msg.result)
+            return TclRemoteObjRef(self, cmd_idx, r_msg.get_bytes("result"), cmd)
+
+        # Error path, rarely taken:
+        self.log("error", f"{r_msg.result}")
+        raise TclError(r_msg.result)
+
+    def eval_many(self, cmds:list[str]) -> list[TclRemoteObjRef]:
+        """
+        Passes multiple strings to Tcl for evaluation with a single round trip
+        (see pipeline).
+        """
+        with self.pipeline():
+            refs = [self.eval(cmd) for cmd in cmds]
+        return refs
+
+    # contextmanager refers to TclTool.contextmanager within the class body.
+    @contextlib.contextmanager
+    def pipeline(self):
+        """
+        Collects all Tcl commands issued within the with block and sends them
+        to Tcl in a single batch at the end of the block, which saves one
+        round trip per command. Yields a TclToolInterface.
+
+        The returned TclRemoteObjRefs can be passed as arguments to subsequent
+        commands within the block. Accessing the value of a TclRemoteObjRef
+        within the block sends the commands collected so far (see
+        flush_pipeline). Once a command fails, the remaining commands of the
+        batch are not executed and a TclError is raised. Once
+        pipeline_max_len commands have been collected, they are sent as well.
+        If the block is left with an exception, pending commands are discarded.
+
+        Example::
+
+            tool = Tclsh()
+            with tool as t:
+                with tool.pipeline() as p:
+                    a = p.expr(1, "+", 2)
+                    b = p.expr(a, "*", 3)
+                print(b) # 9
+        """
+        if self._pipeline != None:
+            # Nested pipelines are merged into the outer one.
+            yield TclToolInterface(self)
+            return
+        self._pipeline = []
+        try:
+            yield TclToolInterface(self)
+            self.flush_pipeline()
+        except:
+            self.discard_pipeline("discarded, as the pipeline was left with an exception.")
+            raise
+        finally:
+            self._pipeline = None
+
+    def discard_pipeline(self, reason:str):
+        """
+        Drops the commands collected by pipeline that have not been sent.
+        Their cmd_idx values are given back and their TclRemoteObjRefs are
+        marked as failed.
+        """
+        for ref in self._pipeline:
+            ref.fail(f"Pipelined Tcl command '{ref.cmd}' was {reason}")
+        self._next_cmd_idx -= len(self._pipeline)
+        self._pipeline = []
+
+    def flush_pipeline(self):
+        """
+        Sends the commands collected by pipeline so far and resolves their
+        TclRemoteObjRefs. Does nothing outside of pipeline.
+        """
+        if not self._pipeline:
+            return
+        refs = self._pipeline
+        try:
+            self.bs.send(msg.PyProcedureCallBatch(count=str(len(refs))),
+                *[msg.PyProcedureCall(command=ref.cmd) for ref in refs],
+                replies=len(refs))
+        except:
+            self.discard_pipeline("not sent, as sending the pipeline failed.")
+            raise
+        self._pipeline = []
+        error = None
+        for ref in refs:
+            r_msg = self.bs.recv(msg.TclProcedureResult)
+            assert int(r_msg.cmd_idx) == ref.cmd_idx
+            if r_msg.err_code != "0":
+                if not error:
+                    self.log("error", f"{r_msg.result}")
+                    error = TclError(r_msg.result)
+                    ref.fail(f"Pipelined Tcl command '{ref.cmd}' failed: {r_msg.result}")
+                else:
+                    ref.fail(f"Pipelined Tcl command '{ref.cmd}' was skipped, "
+                        "as a previous command of the pipeline failed.")
+            else:
+                if self.log_retvals or self.debug_py:
+                    self.log("retval", r_msg.result)
+                ref.resolve(r_msg.get_bytes("result"))
+        if error:
+            raise error
 
 class TclToolInterface:
     """
@@ -330,6 +561,22 @@ class TclToolInterface:
     """
     def __init__(self, tcl_tool:TclTool):
         self.tcl_tool = tcl_tool
+        for name in tcl_tool.precompiled:
+            setattr(self, name, self._precompiled_method(name))
+
+    def _precompiled_method(self, name:str):
+        """
+        Returns a method for a command listed in TclTool.precompiled. Calls
+        without arguments are passed to TclTool.eval directly; calls with
+        arguments are handled by TclTool.proc_call like other methods.
+        """
+        eval = self.tcl_tool.eval
+        proc_call = self.tcl_tool.proc_call
+        def method(*args, **kwargs):
+            if args or kwargs:
+                return proc_call(name, args, kwargs)
+            return eval(name)
+        return method
 
     def __getattr__(self, name):
         """
@@ -341,7 +588,12 @@ class TclToolInterface:
 
             v = t.expr(3, "*", 5)
         """
-        return lambda *args, **kwargs: self.tcl_tool.proc_call(name, args, kwargs)
+        method = lambda *args, **kwargs: self.tcl_tool.proc_call(name, args, kwargs)
+        if not name.startswith("_"):
+            # Subsequent accesses find the method in the instance dict without
+            # calling __getattr__.
+            setattr(self, name, method)
+        return method
 
     def __call__(self, cmd: str) -> TclRemoteObjRef:
         """
@@ -3,6 +3,7 @@
 
 from ..bridge_server import BridgeServer
 from ..bridge_client import BridgeClient
+from ..message import RawMessage
 
 import threading
 from .. import msg_classes as msg
@@ -31,3 +32,19 @@ def test_bridge_server_client():
             print(f"received {resp}")
             assert resp.result == cmd.upper()
         bs.send(msg.PyExit())
+
+def test_bridge_server_client_large_message():
+    # Messages larger than the kernel pipe buffer must not be truncated,
+    # as the end of a message is no longer signaled by EOF.
+    with bridge_server_with_client() as bs:
+        bs.recv(msg.TclHello)
+        cmd = "abcdefghij"*300000
+        bs.send(msg.PyProcedureCall(command=cmd))
+        resp=bs.recv(msg.TclProcedureResult)
+        assert resp.result == cmd.upper()
+        assert len(bs.rbuf) == bs.read_size
+        bs.send(msg.PyExit())
+
+def test_raw_message_bytes_value():
+    assert RawMessage({"command": "Grüße".encode("utf8")}).to_bytes() \
+        == RawMessage({"command": "Grüße"}).to_bytes()
@@ -14,4 +14,22 @@ def test_obj1():
     assert o == "{{a} {b} {c} {d}}"
 
     o = encode([1,2,3,"abc", "def"])
-    assert o == "{{1} {2} {3} {abc} {def}}"
\ No newline at end of file
+    assert o == "{{1} {2} {3} {abc} {def}}"
+
+def test_obj_empty():
+    assert encode([]) == "{}"
+    assert encode({}) == "{}"
+
+def test_obj_braces():
+    assert encode("a{b}c") == r"{a\{b\}c}"
+    assert encode(["{", "}"]) == r"{{\{} {\}}}"
+
+def test_obj_cached_scalars():
+    assert encode(1) == "{1}"
+    assert encode(True) == "{True}"
+    assert encode(1.0) == "{1.0}"
+    assert encode(1) == "{1}"
+
+def test_obj_signed_zero():
+    assert encode(0.0) == "{0.0}"
+    assert encode(-0.0) == "{-0.0}"
@@ -3,7 +3,8 @@
 
 import pytest
 import subprocess
-from .. import TclTool, TclError
+import signal
+from .. import TclTool, TclError, TclToolPool
 
 class Tclsh(TclTool):
     def cmdline(self):
@@ -21,6 +22,14 @@ def test_set_int():
         v=t.set("myvar")
         assert int(v) == 123459
 
+def test_set_unicode():
+    with Tclsh() as t:
+        t.set("myvar", "Grüße, 世界\n")
+        v=t.set("myvar")
+        assert str(v) == "Grüße, 世界\n"
+        v=t.string("length", "Grüße")
+        assert int(v) == 5
+
 def test_set_float():
     with Tclsh() as t:
         t.set("myvar", 3.14)
@@ -145,4 +154,191 @@ def test_child_terminates_zero():
 def test_context_forwards_excepts():
     with pytest.raises(ValueError):
         with Tclsh() as t:
-            raise ValueError("test")  
\ No newline at end of file
+            raise ValueError("test")  
+
+def test_pipeline():
+    tool = Tclsh()
+    with tool as t:
+        with tool.pipeline() as p:
+            a=p.expr(1, '+', 2)
+            b=p.expr(a, '*', 3)
+            p.set("myvar", "ThisIsATest")
+        assert int(a) == 3
+        assert int(b) == 9
+        v=t.set("myvar")
+        assert str(v) == "ThisIsATest"
+        v=t.expr(b, '+', 1)
+        assert int(v) == 10
+
+def test_pipeline_error():
+    tool = Tclsh()
+    with tool as t:
+        with pytest.raises(TclError):
+            with tool.pipeline() as p:
+                a=p.expr(1, '+', 2)
+                b=p.error("myerror")
+                c=p.set("myvar", 1)
+        assert int(a) == 3
+        with pytest.raises(RuntimeError, match="failed: myerror"):
+            str(b)
+        with pytest.raises(RuntimeError, match="skipped"):
+            str(c)
+        with pytest.raises(TclError):
+            t.set("myvar")
+        v=t.expr(a, '+', 1)
+        assert int(v) == 4
+
+def test_eval_many():
+    tool = Tclsh()
+    with tool as t:
+        a, b = tool.eval_many(["expr 1 + 2", "expr 3 * 4"])
+        assert int(a) == 3
+        assert int(b) == 12
+        c, d = tool.proc_call_many([("expr", (a, '+', b), {}), ("lreverse", ([1, 2],), {})])
+        assert int(c) == 15
+        assert str(d) == "2 1"
+
+def test_kwargs():
+    with Tclsh() as t:
+        v=t.lsort([10, 9, 100], integer=True, decreasing=False)
+        assert str(v) == "9 10 100"
+        v=t.lsort(["1 b", "2 a"], index=1)
+        assert str(v) == "{2 a} {1 b}"
+
+def test_result_bytes():
+    with Tclsh() as t:
+        v=t.set("myvar", "Grüße")
+        assert bytes(v) == "Grüße".encode("utf8")
+        assert str(v) == "Grüße"
+        assert bytes(v) == "Grüße".encode("utf8")
+
+class ReusableTclsh(Tclsh):
+    reusable = True
+
+def test_pool():
+    with TclToolPool(ReusableTclsh, size=2) as pool:
+        for i in range(4):
+            with pool.acquire() as t:
+                v=t.expr(i, '*', i)
+                assert int(v) == i*i
+                assert v.cmd_idx == 0
+        with pytest.raises(TclError):
+            with pool.acquire() as t:
+                t.error("myerror")
+        with pool.acquire() as t:
+            assert int(t.expr(1, '+', 1)) == 2
+
+def test_pool_reset_variables():
+    with TclToolPool(ReusableTclsh, size=1) as pool:
+        with pool.acquire() as t:
+            t.set("myvar", "ThisIsATest")
+            assert str(t.set("myvar")) == "ThisIsATest"
+        with pool.acquire() as t:
+            assert int(t.info("exists", "myvar")) == 0
+
+def test_pool_replace_signals():
+    prev_sigint = signal.getsignal(signal.SIGINT)
+    prev_sigchld = signal.getsignal(signal.SIGCHLD)
+    with TclToolPool(ReusableTclsh, size=2) as pool:
+        # The replaced tool was started first, not last.
+        with pytest.raises(KeyError):
+            with pool.acquire() as t:
+                raise KeyError()
+        with pool.acquire() as t:
+            assert int(t.expr(1, '+', 1)) == 2
+    assert signal.getsignal(signal.SIGINT) == prev_sigint
+    assert signal.getsignal(signal.SIGCHLD) == prev_sigchld
+
+def test_pool_not_reusable():
+    with pytest.raises(ValueError):
+        TclToolPool(Tclsh)
+
+class PrecompiledTclsh(Tclsh):
+    precompiled = ("pwd", "info")
+
+def test_precompiled():
+    with PrecompiledTclsh() as t:
+        assert str(t.pwd()) == str(t("pwd"))
+        assert str(t.info("exists", "myvar")) == "0"
+        t.set("myvar", 1)
+        assert str(t.info("exists", "myvar")) == "1"
+
+def test_pipeline_implicit_flush():
+    tool = Tclsh()
+    with tool as t:
+        with tool.pipeline() as p:
+            a=p.expr(1, '+', 2)
+            assert int(a) == 3
+            b=p.expr(a, '*', 3)
+            c=p.expr(b, '+', 1)
+        assert int(b) == 9
+        assert int(c) == 10
+
+def test_pipelined_context():
+    with Tclsh(pipelined=True) as t:
+        t.set("myvar", 5)
+        v=t.expr("$myvar", '*', 2)
+        assert int(v) == 10
+        t.set("myvar", 6)
+    with pytest.raises(TclError):
+        with Tclsh(pipelined=True) as t:
+            t.error("myerror")
+
+def test_pipelined_context_many_commands():
+    with Tclsh(pipelined=True) as t:
+        for i in range(600):
+            t.set("x", i)
+        assert int(t.set("x")) == 599
+
+def test_pipelined_context_exception(tmp_path):
+    path = tmp_path / "out.txt"
+    with pytest.raises(KeyError):
+        with Tclsh(pipelined=True) as t:
+            f = t.open(str(path), "w")
+            t.puts(f, "done")
+            t.close(f)
+            raise KeyError()
+    assert path.read_text() == "done\n"
+
+def test_nested_contexts_signals():
+    prev_sigint = signal.getsignal(signal.SIGINT)
+    with Tclsh() as t1:
+        with Tclsh() as t2:
+            assert int(t2.expr(1, '+', 1)) == 2
+        assert int(t1.expr(2, '+', 2)) == 4
+    assert signal.getsignal(signal.SIGINT) == prev_sigint
+
+def test_nested_contexts_sigchld(monkeypatch):
+    # Fallback without pidfd: the SIGCHLD handler of the outer context must
+    # ignore the exit of the inner child process.
+    from .. import tcltool
+    monkeypatch.setattr(tcltool, "pidfd_supported", lambda: False)
+    prev_sigchld = signal.getsignal(signal.SIGCHLD)
+    with Tclsh() as t1:
+        for i in range(10):
+            with Tclsh() as t2:
+                assert int(t2.expr(i, '+', 1)) == i+1
+            assert int(t1.expr(i, '+', 2)) == i+2
+    assert signal.getsignal(signal.SIGCHLD) == prev_sigchld
+
+def test_pipeline_many_commands():
+    # A batch with more frames than IOV_MAX must be split into multiple writes.
+    tool = Tclsh(log_commands=False)
+    with tool as t:
+        refs = tool.eval_many([f"expr {i} + 1" for i in range(1000)])
+        assert [int(v) for v in refs] == list(range(1, 1001))
+        assert int(t.expr(refs[-1], '+', 0)) == 1000
+
+def test_pipeline_discarded():
+    tool = Tclsh()
+    with tool as t:
+        with pytest.raises(ValueError):
+            with tool.pipeline() as p:
+                a=p.expr(1, '+', 2)
+                raise ValueError("test")
+        v=t.expr(5, '+', 5)
+        assert int(v) == 10
+        with pytest.raises(RuntimeError, match="discarded"):
+            str(a)
+        with pytest.raises(RuntimeError, match="discarded"):
+            t.expr(a, '+', 0)